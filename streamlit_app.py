@@ -2,10 +2,17 @@
 import streamlit as st
 from streamlit_drawable_canvas import st_canvas
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.patches import FancyArrowPatch, Circle
-from PIL import Image
+from collections import defaultdict
+from functools import lru_cache
+import hashlib
+import html
+import threading
 import io
+import json
+try:
+    import orjson
+except ImportError:  # orjson es opcional: sin él se usa json de la biblioteca estándar
+    orjson = None
 
 st.set_page_config(page_title="Dibujador de Diagramas de Feynman", layout="wide")
 
@@ -29,7 +36,7 @@ st.sidebar.markdown("""
 - Usa la **herramienta 'circle'** para marcar vértices/nodos.
 - Usa la **herramienta 'line'** para dibujar propagadores (luego la app inferirá endpoints).
 - Dibuja cada tipo en su **color** para ayudar a la detección automática.
-- Cuando termines, pulsa **Reconstruir diagrama** para procesar los objetos, o **Exportar PNG** / **Generar TikZ**.
+- Cuando termines, pulsa **Reconstruir diagrama** para procesar los objetos, o **Exportar PNG** / **Exportar SVG** / **Generar TikZ**.
 """)
 
 # Colors assigned to particle types (hex)
@@ -54,6 +61,9 @@ stroke_width = st.sidebar.slider("Grosor del trazo", 1, 6, 3)
 # Choose tool for drawing in canvas
 tool = st.sidebar.selectbox("Herramienta del lienzo:", ["selection", "line", "rect", "circle", "freedraw", "eraser"])
 
+# Motor para exportar PNG: Pillow dibuja directamente (rápido), matplotlib es el render clásico
+png_engine = st.sidebar.selectbox("Motor de exportación PNG:", ["Pillow (rápido)", "Matplotlib"])
+
 # Set the stroke color according to selected particle for drawing
 stroke_color = color_map[particle]
 
@@ -76,6 +86,31 @@ canvas_result = st_canvas(
 st.markdown("**Tips:** usa 'circle' para vértices (nodos) y 'line' para propagadores. Cambia el 'particle' en la barra lateral antes de dibujar un nuevo tipo para que el color se asocie correctamente.")
 
 # --------- Procesamiento de objetos dibujados ----------
+# tablas inversas color -> tipo (una sola búsqueda hash por objeto)
+COLOR_LUT = {v.lower(): k for k, v in color_map.items()}
+COLOR_LUT_NOHASH = {v.lower().lstrip("#"): k for k, v in color_map.items()}
+
+def color_to_type(hexcolor):
+    """Mapea un color de trazo (hex) al tipo de partícula."""
+    c = (hexcolor or "").lower()
+    # si no coincide exactamente, prueba sin '#' y sin canal alfa (p. ej. '1f77b4ff')
+    return COLOR_LUT.get(c) or COLOR_LUT_NOHASH.get(c.lstrip("#")[:6], "desconocido")
+
+def _line_endpoints(obj):
+    """Extremos (x1, y1, x2, y2) de un objeto line/path de Fabric.js."""
+    x1 = obj.get("x1")
+    if x1 is not None:
+        return x1, obj.get("y1"), obj.get("x2"), obj.get("y2")
+    # try path -> approximate by bounding box or first/last points
+    left = obj.get("left", 0); top = obj.get("top", 0)
+    points = obj.get("points") or []
+    if points and isinstance(points, list) and len(points) >= 2:
+        p0 = points[0]; pN = points[-1]
+        return left + p0.get("x", 0), top + p0.get("y", 0), left + pN.get("x", 0), top + pN.get("y", 0)
+    # fallback: use left/top and width/height
+    w = obj.get("width", 0); h = obj.get("height", 0)
+    return left, top, left + w, top + h
+
 def parse_canvas_objects(json_data):
     """
     Extrae nodos y aristas desde json_data de st_canvas.
@@ -88,147 +123,300 @@ def parse_canvas_objects(json_data):
         return [], []
 
     objects = json_data["objects"]
+    # separar por tipo; ignoramos rect/freedraw/others en el parseado por ahora
+    circles = [o for o in objects if o.get("type") in ("circle", "ellipse")]
+    lines = [o for o in objects if o.get("type") in ("line", "path")]
+
+    def stroke_type(obj):
+        return color_to_type(obj.get("stroke") or obj.get("strokeStyle") or "")
+
     nodes = []
-    edges = []
+    if circles:
+        # canvas: left, top, radiusX, radiusY -> centro = esquina + radio
+        n = len(circles)
+        left = np.fromiter((o.get("left", 0) for o in circles), float, n)
+        top = np.fromiter((o.get("top", 0) for o in circles), float, n)
+        rx = np.fromiter((o.get("radiusX", o.get("rx", 10)) for o in circles), float, n)
+        ry = np.fromiter((o.get("radiusY", o.get("ry", 10)) for o in circles), float, n)
+        cxs = (left + rx).tolist()
+        cys = (top + ry).tolist()
+        nodes = [
+            {"id": i, "x": cx, "y": cy, "type": stroke_type(obj)}
+            for i, (obj, cx, cy) in enumerate(zip(circles, cxs, cys))
+        ]
 
-    # función auxiliar para mapear color a tipo
-    def color_to_type(hexcolor):
-        for k, v in color_map.items():
-            if v.lower() == (hexcolor or "").lower():
-                return k
-        # si no coincide exactamente, intenta comparar por substring
-        for k, v in color_map.items():
-            if v.lower().lstrip("#") in (hexcolor or "").lower():
-                return k
-        return "desconocido"
-
-    node_id = 0
-    for obj in objects:
-        typ = obj.get("type")
-        stroke = obj.get("stroke", "").lower() if obj.get("stroke") else obj.get("strokeStyle", "").lower() if obj.get("strokeStyle") else ""
-        if typ == "circle" or typ == "ellipse":
-            # canvas: left, top, radiusX, radiusY
-            left = obj.get("left", 0)
-            top = obj.get("top", 0)
-            rx = obj.get("radiusX", obj.get("rx", 10))
-            ry = obj.get("radiusY", obj.get("ry", 10))
-            cx = left + rx
-            cy = top + ry
-            nodes.append({
-                "id": node_id,
-                "x": cx,
-                "y": cy,
-                "type": color_to_type(stroke),
-                "raw": obj
-            })
-            node_id += 1
-        elif typ == "line" or typ == "path":
-            # Fabric.js line: x1,y1,x2,y2 OR path objects can be approximated
-            x1 = obj.get("x1")
-            y1 = obj.get("y1")
-            x2 = obj.get("x2")
-            y2 = obj.get("y2")
-            if x1 is None:
-                # try path -> approximate by bounding box or first/last points
-                left = obj.get("left", 0); top = obj.get("top", 0)
-                points = obj.get("points") or []
-                if points and isinstance(points, list) and len(points) >= 2:
-                    p0 = points[0]; pN = points[-1]
-                    x1, y1 = left + p0.get("x", 0), top + p0.get("y", 0)
-                    x2, y2 = left + pN.get("x", 0), top + pN.get("y", 0)
-                else:
-                    # fallback: use left/top and width/height
-                    w = obj.get("width", 0); h = obj.get("height", 0)
-                    x1, y1, x2, y2 = left, top, left + w, top + h
-            edges.append({
-                "x1": x1, "y1": y1, "x2": x2, "y2": y2,
-                "type": color_to_type(stroke),
-                "raw": obj
-            })
-        # ignoramos rect/freedraw/others en el parseado por ahora
+    edges = []
+    if lines:
+        # Fabric.js line: x1,y1,x2,y2 OR path objects can be approximated.
+        # Cada objeto necesita sus propios fallbacks (_line_endpoints): no se vectoriza.
+        edges = [
+            {"x1": x1, "y1": y1, "x2": x2, "y2": y2, "type": stroke_type(obj)}
+            for obj, (x1, y1, x2, y2) in zip(lines, map(_line_endpoints, lines))
+        ]
     return nodes, edges
 
-nodes, edges = parse_canvas_objects(canvas_result.json_data if canvas_result else None)
+def _dumps_sorted(obj):
+    """JSON canónico (claves ordenadas) en bytes: orjson si está instalado, si no json."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS)
+    return json.dumps(obj, sort_keys=True).encode("utf-8")
+
+def _loads(data):
+    """Decodifica JSON (bytes) con orjson si está instalado, si no con json."""
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+def canvas_digest(objects_json):
+    """
+    Huella estable (blake2b) de los objetos del lienzo serializados (bytes).
+    Se usa como clave de caché para que las exportaciones sobrevivan a los reruns.
+    """
+    return hashlib.blake2b(objects_json, digest_size=16).hexdigest()
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def parse_canvas_objects_cached(objects_json):
+    """parse_canvas_objects memorizado por el JSON (canónico) de los objetos del lienzo."""
+    return parse_canvas_objects({"objects": _loads(objects_json)})
+
+canvas_data = canvas_result.json_data if canvas_result else None
+# una sola serialización canónica (claves ordenadas): sirve de clave
+# para el parseo y las exportaciones
+canvas_json = _dumps_sorted((canvas_data or {}).get("objects", []))
+canvas_key = canvas_digest(canvas_json)
+# Streamlit re-ejecuta el script en cada interacción (slider, selectbox...):
+# solo se vuelve a parsear cuando el contenido del lienzo cambia realmente.
+if st.session_state.get("canvas_hash") == canvas_key:
+    nodes, edges = st.session_state["nodes"], st.session_state["edges"]
+else:
+    nodes, edges = parse_canvas_objects_cached(canvas_json)
+    st.session_state["canvas_hash"] = canvas_key
+    st.session_state["nodes"] = nodes
+    st.session_state["edges"] = edges
 
 st.markdown("### Vista rápida del diagrama detectado")
 st.write(f"Vértices detectados: {len(nodes)} — propagadores detectados: {len(edges)}")
 
-if len(nodes) > 0:
+# hasta PREVIEW_MAX_ITEMS objetos se listan en columnas; por encima, una sola tabla
+# (un único mensaje al navegador en vez de un st.write por objeto)
+PREVIEW_MAX_ITEMS = 20
+
+if 0 < len(nodes) <= PREVIEW_MAX_ITEMS:
     cols = st.columns(min(4, len(nodes)))
     for i, n in enumerate(nodes):
         cols[i % len(cols)].write(f"Node {n['id']}: ({int(n['x'])}, {int(n['y'])}) — {n['type']}")
+elif len(nodes) > PREVIEW_MAX_ITEMS:
+    st.dataframe(nodes, column_order=["id", "x", "y", "type"], hide_index=True, height=250)
 
-if len(edges) > 0:
+if 0 < len(edges) <= PREVIEW_MAX_ITEMS:
     cols2 = st.columns(min(4, len(edges)))
     for i, e in enumerate(edges):
         cols2[i % len(cols2)].write(f"Edge {i}: ({int(e['x1'])},{int(e['y1'])}) → ({int(e['x2'])},{int(e['y2'])}) — {e['type']}")
+elif len(edges) > PREVIEW_MAX_ITEMS:
+    st.dataframe(edges, column_order=["x1", "y1", "x2", "y2", "type"], height=250)
 
 # --------- Función para dibujar con matplotlib (y exportar PNG) ----------
-def render_diagram_matplotlib(nodes, edges, width=CANVAS_WIDTH, height=CANVAS_HEIGHT, dpi=100):
+# tipo de propagador -> (color, estilo de línea, dirección de flecha, opciones TikZ)
+# dirección: 1 = flecha a favor del trazo, -1 = en contra, 0 = sin flecha
+EDGE_STYLE = {
+    "fermion (→/←)": (color_map["fermion (→/←)"], "solid", 1, "[->]"),
+    "antifermion (←/→)": (color_map["antifermion (←/→)"], "solid", -1, "[<-]"),
+    "fotón (photon)": (color_map["fotón (photon)"], "dashdot", 0, "[photon]"),
+    "gluón (gluon)": (color_map["gluón (gluon)"], "dashed", 0, "[gluon]"),
+    "línea neutra (línea simple)": (color_map["línea neutra (línea simple)"], "solid", 0, ""),
+}
+DEFAULT_EDGE_STYLE = ("#222222", "solid", 0, "[->]")
+
+# matplotlib y PIL se importan solo al exportar: el uso interactivo del lienzo
+# (dibujar, sliders) no paga su coste de importación
+@lru_cache(maxsize=1)
+def _lazy_mpl():
+    import matplotlib.pyplot as plt
+    from matplotlib.collections import LineCollection
+    return plt, LineCollection
+
+@lru_cache(maxsize=1)
+def _lazy_pil():
+    from PIL import Image, ImageDraw, ImageFont
+    return Image, ImageDraw, ImageFont
+
+ARROW_LEN = 14  # longitud (px) de las flechas de fermiones en matplotlib
+MAX_LABELED_NODES = 50  # a partir de aquí las exportaciones no etiquetan los vértices
+
+def _arrow_geometry(arrow_edges):
+    """
+    Punta (70% del camino) y tangente unitaria de cada flecha, vectorizado con NumPy.
+    arrow_edges: filas (x1, y1, x2, y2, dirección). Devuelve (tips, unit, keep), donde
+    keep descarta las aristas de longitud nula (sin dirección definida).
+    """
+    E = np.asarray(arrow_edges, dtype=float).reshape(-1, 5)
+    p1, p2 = E[:, 0:2], E[:, 2:4]
+    tangents = (p2 - p1) * E[:, 4:5]
+    norms = np.linalg.norm(tangents, axis=1, keepdims=True)
+    unit = tangents / np.maximum(norms, 1e-9)
+    tips = p1 + 0.7 * (p2 - p1)
+    return tips, unit, norms[:, 0] > 0
+
+def _arrow_triangles(arrow_edges, length=10, half_width=5):
+    """
+    Triángulos de punta de flecha (K x 3 x 2) calculados analíticamente para PIL/SVG:
+    punta m, base m - length*t ± half_width*n con n = (-t_y, t_x). Devuelve (triángulos, keep).
+    """
+    tips, unit, keep = _arrow_geometry(arrow_edges)
+    normal = np.column_stack((-unit[:, 1], unit[:, 0]))
+    base = tips - length * unit
+    triangles = np.stack((tips, base + half_width * normal, base - half_width * normal), axis=1)
+    return triangles[keep], keep
+
+@st.cache_resource(show_spinner=False)
+def _get_figure(width=CANVAS_WIDTH, height=CANVAS_HEIGHT, dpi=100):
+    """
+    Figure/Axes creados una sola vez por proceso y reutilizados entre exportaciones.
+    Los ejes ocupan toda la figura, así no hace falta tight_layout ni bbox_inches="tight".
+    Todas las sesiones comparten la figura: el lock serializa los renders.
+    """
+    plt, _ = _lazy_mpl()
     fig, ax = plt.subplots(figsize=(width/dpi, height/dpi), dpi=dpi)
-    ax.set_xlim(0, width)
-    ax.set_ylim(height, 0)  # invertir y para que origen top-left como canvas
-    ax.axis("off")
+    ax.set_position([0, 0, 1, 1])
+    return fig, ax, threading.Lock()
+
+def render_diagram_matplotlib(nodes, edges, width=CANVAS_WIDTH, height=CANVAS_HEIGHT, dpi=100):
+    """
+    Dibuja el diagrama con matplotlib y devuelve los píxeles RGBA (np.ndarray H x W x 4).
+    La codificación PNG se hace una sola vez en png_bytes_cached (ver _encode_png).
+    """
+    _, LineCollection = _lazy_mpl()
+    fig, ax, lock = _get_figure(width, height, dpi)
+    with lock:
+        ax.clear()
+        ax.set_xlim(0, width)
+        ax.set_ylim(height, 0)  # invertir y para que origen top-left como canvas
+        ax.axis("off")
+
+        # Dibujar edges: se agrupan por (color, estilo) -> un LineCollection por grupo
+        segments = defaultdict(list)
+        arrow_edges, arrow_colors = [], []
+        for e in edges:
+            x1, y1, x2, y2 = e["x1"], e["y1"], e["x2"], e["y2"]
+            color, style, arrow, _ = EDGE_STYLE.get(e["type"], DEFAULT_EDGE_STYLE)
+            segments[(color, style)].append(((x1, y1), (x2, y2)))
+
+            # Si es fermion, añadir flecha
+            if arrow:
+                arrow_edges.append((x1, y1, x2, y2, arrow))
+                arrow_colors.append(color)
+
+        for (color, style), segs in segments.items():
+            ax.add_collection(LineCollection(np.array(segs), colors=color, linestyles=style, linewidths=2))
+
+        # todas las puntas de flecha en una sola llamada a quiver
+        if arrow_edges:
+            tips, unit, keep = _arrow_geometry(arrow_edges)
+            vec = ARROW_LEN * unit[keep]
+            ax.quiver(tips[keep, 0], tips[keep, 1], vec[:, 0], vec[:, 1], color=np.asarray(arrow_colors)[keep],
+                      angles="xy", scale_units="xy", scale=1,
+                      pivot="tip", width=0.003, headwidth=4, headlength=5, headaxislength=4.5, zorder=4)
+
+        # Dibujar nodes: un solo scatter (radio 8 px -> tamaño del marcador en pt^2)
+        if nodes:
+            xs = np.fromiter((n["x"] for n in nodes), float, len(nodes))
+            ys = np.fromiter((n["y"] for n in nodes), float, len(nodes))
+            ax.scatter(xs, ys, s=(16 * 72 / dpi) ** 2, c="k", linewidths=0, zorder=5)
+        # las etiquetas son un artista por nodo: solo en diagramas pequeños
+        for n in (nodes if len(nodes) < MAX_LABELED_NODES else ()):
+            cx, cy = n["x"], n["y"]
+            # etiqueta con tipo abreviado
+            short = n["type"].split()[0] if n["type"] != "desconocido" else "N"
+            ax.text(cx+10, cy-10, short, fontsize=8)
+
+        fig.canvas.draw()
+        # copia: el buffer del canvas se reutiliza en el siguiente render
+        return np.array(fig.canvas.buffer_rgba())
+
+def _encode_png(pixels):
+    """Codifica un array de píxeles (RGB o RGBA) como PNG (bytes)."""
+    Image, _, _ = _lazy_pil()
+    buf = io.BytesIO()
+    Image.fromarray(pixels).save(buf, "PNG", optimize=False)
+    return buf.getvalue()
+
+# --------- Render directo con Pillow (sin matplotlib) ----------
+# patrones on/off (px) para simular los estilos de línea de matplotlib
+DASH_PATTERNS = {"dashed": (7, 3), "dashdot": (7, 3, 1, 3)}
+
+def _dash_segments(x1, y1, x2, y2, pattern):
+    """Trocea el segmento (x1,y1)-(x2,y2) en los tramos visibles del patrón on/off."""
+    length = float(np.hypot(x2 - x1, y2 - y1))
+    if length == 0:
+        return [(x1, y1, x2, y2)]
+    period = sum(pattern)
+    on_len = np.array(pattern[0::2], dtype=float)
+    on_off = np.concatenate(([0.0], np.cumsum(pattern)))[0:-1:2]
+    starts = (np.arange(0.0, length, period)[:, None] + on_off).ravel()
+    ends = np.minimum(starts + np.tile(on_len, len(starts) // len(on_len)), length)
+    keep = starts < length
+    t0 = starts[keep] / length
+    t1 = ends[keep] / length
+    dx, dy = x2 - x1, y2 - y1
+    return np.column_stack((x1 + t0*dx, y1 + t0*dy, x1 + t1*dx, y1 + t1*dy)).tolist()
+
+def _label_font(size=11):
+    """DejaVuSans (con acentos) si está disponible; si no, la fuente por defecto de PIL."""
+    _, _, ImageFont = _lazy_pil()
+    try:
+        return ImageFont.truetype("DejaVuSans.ttf", size)
+    except OSError:
+        return ImageFont.load_default(size=size)
+
+def render_diagram_pil(nodes, edges, width=CANVAS_WIDTH, height=CANVAS_HEIGHT):
+    """
+    Rasteriza el diagrama directamente con PIL.ImageDraw y devuelve los píxeles RGB (np.ndarray).
+    Mismo aspecto que render_diagram_matplotlib para líneas, flechas y vértices.
+    """
+    Image, ImageDraw, _ = _lazy_pil()
+    img = Image.new("RGB", (width, height), "white")
+    d = ImageDraw.Draw(img)
+    font = _label_font()
 
-    # Dibujar edges
+    arrow_edges, arrow_colors = [], []
     for e in edges:
         x1, y1, x2, y2 = e["x1"], e["y1"], e["x2"], e["y2"]
-        typ = e["type"]
-        color = "#222222"
-        style = "solid"
-        arrow = False
-
-        if "fermion" in typ:
-            color = color_map["fermion (→/←)"]
-            arrow = True
-            style = "solid"
-        elif "antifermion" in typ:
-            color = color_map["antifermion (←/→)"]
-            arrow = True
-            style = "solid"
-        elif "fotón" in typ or "photon" in typ:
-            color = color_map["fotón (photon)"]
-            style = "dashdot"
-            arrow = False
-        elif "gluón" in typ:
-            color = color_map["gluón (gluon)"]
-            style = "dashed"
-            arrow = False
-        elif "línea neutra" in typ:
-            color = color_map["línea neutra (línea simple)"]
-            style = "solid"
-            arrow = False
-
-        # Dibujar línea
-        ax.plot([x1, x2], [y1, y2], linestyle=style, linewidth=2, color=color)
-
-        # Si es fermion, añadir flecha
+        color, style, arrow, _ = EDGE_STYLE.get(e["type"], DEFAULT_EDGE_STYLE)
+        pattern = DASH_PATTERNS.get(style)
+        pieces = _dash_segments(x1, y1, x2, y2, pattern) if pattern else [(x1, y1, x2, y2)]
+        for piece in pieces:
+            d.line(piece, fill=color, width=3)  # ~2 pt a 100 dpi, como en matplotlib
+
         if arrow:
-            # posición de la flecha: 70% del camino
-            sx, sy = x1 + 0.7*(x2-x1), y1 + 0.7*(y2-y1)
-            dx, dy = (x2-x1)*0.001, (y2-y1)*0.001
-            arr = FancyArrowPatch((sx, sy), (sx+dx, sy+dy),
-                                 arrowstyle='-|>', mutation_scale=15, color=color, linewidth=0)
-            ax.add_patch(arr)
-
-    # Dibujar nodes
+            arrow_edges.append((x1, y1, x2, y2, arrow))
+            arrow_colors.append(color)
+
+    # puntas de flecha en el 70% del camino, orientadas según la línea
+    if arrow_edges:
+        triangles, keep = _arrow_triangles(arrow_edges)
+        for tri, color in zip(triangles.tolist(), np.asarray(arrow_colors)[keep].tolist()):
+            d.polygon([tuple(p) for p in tri], fill=color)
+
+    labeled = len(nodes) < MAX_LABELED_NODES
     for n in nodes:
         cx, cy = n["x"], n["y"]
-        ax.add_patch(Circle((cx, cy), radius=8, color="k", zorder=5))
-        # etiqueta con tipo abreviado
-        short = n["type"].split()[0] if n["type"] != "desconocido" else "N"
-        ax.text(cx+10, cy-10, short, fontsize=8)
+        d.ellipse((cx-8, cy-8, cx+8, cy+8), fill="black")
+        if labeled:
+            short = n["type"].split()[0] if n["type"] != "desconocido" else "N"
+            d.text((cx+10, cy-10), short, fill="black", font=font, anchor="ls")
 
-    plt.tight_layout(pad=0)
-    buf = io.BytesIO()
-    plt.savefig(buf, format="png", dpi=dpi, bbox_inches='tight', pad_inches=0.01)
-    buf.seek(0)
-    img = Image.open(buf)
-    plt.close(fig)
-    return img
+    return np.asarray(img)
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def png_bytes_cached(canvas_key, engine, _nodes, _edges):
+    """
+    PNG (bytes) del diagrama, memorizado por la huella del lienzo y el motor.
+    Los argumentos con prefijo '_' no se hashean: la clave es canvas_key.
+    """
+    if engine == "Matplotlib":
+        return _encode_png(render_diagram_matplotlib(_nodes, _edges))
+    return _encode_png(render_diagram_pil(_nodes, _edges))
 
 # Buttons to generate outputs
-col_gen, col_tikz, col_png = st.columns(3)
+col_gen, col_tikz, col_png, col_svg = st.columns(4)
 with col_gen:
     if st.button("🔁 Reconstruir diagrama (actualizar vista)"):
         st.success("Diagrama reconstruido a partir del lienzo. Revisa las listas arriba para confirmar nodos/aristas.")
@@ -238,17 +426,22 @@ with col_png:
         if len(nodes) + len(edges) == 0:
             st.error("No hay objetos en el lienzo para exportar.")
         else:
-            im = render_diagram_matplotlib(nodes, edges)
-            bio = io.BytesIO()
-            im.save(bio, format="PNG")
-            st.image(im, caption="Diagrama exportado (previsualización)")
-            st.download_button("Descargar PNG", data=bio.getvalue(), file_name="diagrama_feynman.png", mime="image/png")
+            # los mismos bytes PNG (cacheados) sirven para la previsualización y la descarga
+            png = png_bytes_cached(canvas_key, png_engine, nodes, edges)
+            st.image(png, caption="Diagrama exportado (previsualización)")
+            st.download_button("Descargar PNG", data=png, file_name="diagrama_feynman.png", mime="image/png")
 
 # --------- Generador simple de TikZ (no usa tikz-feynman, genera tikz directo) ----------
+# plantillas precompiladas (una por tipo de propagador)
+NODE_FMT = "\\node[draw, circle, inner sep=1pt] (n{id}) at ({x:.1f},{ty:.1f}) {{{id}}};"
+_EDGE_FMT = "\\draw{opts} ({{x1:.1f}},{{ty1:.1f}}) -- ({{x2:.1f}},{{ty2:.1f}});"
+EDGE_FMT_BY_TYPE = {typ: _EDGE_FMT.format(opts=style[3]) for typ, style in EDGE_STYLE.items()}
+DEFAULT_EDGE_FMT = _EDGE_FMT.format(opts=DEFAULT_EDGE_STYLE[3])
+
 def generate_tikz(nodes, edges, width=CANVAS_WIDTH, height=CANVAS_HEIGHT):
     """
     Genera un bloque de TikZ con nodos y aristas.
-    Usa: \usetikzlibrary{decorations.pathmorphing,arrows.meta}
+    Usa: \\usetikzlibrary{decorations.pathmorphing,arrows.meta}
     """
     scale_x = 10  # factor para convertir pix -> cm (ajustable)
     scale_y = 10
@@ -258,49 +451,81 @@ def generate_tikz(nodes, edges, width=CANVAS_WIDTH, height=CANVAS_HEIGHT):
               "\\tikzset{photon/.style={decorate, decoration={snake, amplitude=1.2mm}, line width=1pt}}\n"
               "\\tikzset{gluon/.style={decorate, decoration={coil, aspect=0.6, segment length=2pt}, line width=1pt}}\n")
 
-    node_lines = []
-    for n in nodes:
-        x = n["x"]
-        y = n["y"]
-        # invertir Y para coordenadas tikz-friendly
-        ty = height - y
-        node_lines.append(f"\\node[draw, circle, inner sep=1pt] (n{n['id']}) at ({x:.1f},{ty:.1f}) {{{n['id']}}};")
-
-    edge_lines = []
-    for i, e in enumerate(edges):
-        x1, y1, x2, y2 = e["x1"], e["y1"], e["x2"], e["y2"]
-        ty1 = height - y1; ty2 = height - y2
-        typ = e["type"]
-        style = "->"  # default arrow
-        extra = ""
-        if "fotón" in typ or "photon" in typ:
-            style = ""
-            extra = "[photon]"
-        elif "gluón" in typ:
-            style = ""
-            extra = "[gluon]"
-        elif "fermion" in typ:
-            style = "->"
-        elif "antifermion" in typ:
-            style = "<-"
-        elif "línea neutra" in typ:
-            style = ""
-
-        edge_lines.append(f"\\draw{extra} ({x1:.1f},{ty1:.1f}) {style} -- ({x2:.1f},{ty2:.1f});")
+    # invertir Y para coordenadas tikz-friendly
+    node_block = "\n".join(NODE_FMT.format(id=n["id"], x=n["x"], ty=height - n["y"]) for n in nodes)
+    edge_block = "\n".join(
+        EDGE_FMT_BY_TYPE.get(e["type"], DEFAULT_EDGE_FMT).format(
+            x1=e["x1"], ty1=height - e["y1"], x2=e["x2"], ty2=height - e["y2"])
+        for e in edges
+    )
 
     footer = "\\end{tikzpicture}\n"
-    tikz_code = header + "\n".join(node_lines) + "\n" + "\n".join(edge_lines) + "\n" + footer
+    tikz_code = header + node_block + "\n" + edge_block + "\n" + footer
     return tikz_code
 
+@st.cache_data(max_entries=32, show_spinner=False)
+def generate_tikz_cached(canvas_key, _nodes, _edges):
+    """Código TikZ memorizado por la huella del lienzo (ver png_bytes_cached)."""
+    return generate_tikz(_nodes, _edges)
+
 with col_tikz:
     if st.button("🧾 Generar código TikZ"):
         if len(nodes) + len(edges) == 0:
             st.error("No hay objetos para convertir a TikZ.")
         else:
-            tikz = generate_tikz(nodes, edges)
+            tikz = generate_tikz_cached(canvas_key, nodes, edges)
             st.code(tikz, language="tex")
             st.download_button("Descargar código .tex", data=tikz.encode("utf-8"), file_name="diagrama_feynman.tex", mime="text/x-tex")
 
+# --------- Exportación vectorial (SVG escrito directamente, sin matplotlib) ----------
+def export_svg(nodes, edges, width=CANVAS_WIDTH, height=CANVAS_HEIGHT):
+    """
+    Genera un documento SVG con las aristas (líneas + flechas) y los vértices (círculos + etiqueta).
+    Mismas coordenadas que el lienzo: origen arriba a la izquierda.
+    """
+    parts = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+             f'viewBox="0 0 {width} {height}">',
+             f'<rect width="{width}" height="{height}" fill="white"/>']
+    arrow_edges, arrow_colors = [], []
+    for e in edges:
+        color, style, arrow, _ = EDGE_STYLE.get(e["type"], DEFAULT_EDGE_STYLE)
+        pattern = DASH_PATTERNS.get(style)
+        dash_attr = f' stroke-dasharray="{" ".join(map(str, pattern))}"' if pattern else ""
+        parts.append(f'<line x1="{e["x1"]:.1f}" y1="{e["y1"]:.1f}" x2="{e["x2"]:.1f}" y2="{e["y2"]:.1f}" '
+                     f'stroke="{color}" stroke-width="2"{dash_attr}/>')
+        if arrow:
+            arrow_edges.append((e["x1"], e["y1"], e["x2"], e["y2"], arrow))
+            arrow_colors.append(color)
+    # un <polygon> por punta de flecha (misma geometría que el PNG de Pillow)
+    if arrow_edges:
+        triangles, keep = _arrow_triangles(arrow_edges)
+        for tri, color in zip(triangles.tolist(), np.asarray(arrow_colors)[keep].tolist()):
+            points = " ".join(f"{x:.1f},{y:.1f}" for x, y in tri)
+            parts.append(f'<polygon points="{points}" fill="{color}"/>')
+    labeled = len(nodes) < MAX_LABELED_NODES
+    for n in nodes:
+        parts.append(f'<circle cx="{n["x"]:.1f}" cy="{n["y"]:.1f}" r="8" fill="black"/>')
+        if labeled:
+            short = n["type"].split()[0] if n["type"] != "desconocido" else "N"
+            parts.append(f'<text x="{n["x"]+10:.1f}" y="{n["y"]-10:.1f}" font-size="11" '
+                         f'font-family="sans-serif">{html.escape(short)}</text>')
+    parts.append("</svg>")
+    return "\n".join(parts)
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def export_svg_cached(canvas_key, _nodes, _edges):
+    """SVG memorizado por la huella del lienzo (ver png_bytes_cached)."""
+    return export_svg(_nodes, _edges)
+
+with col_svg:
+    if st.button("🖋️ Exportar SVG"):
+        if len(nodes) + len(edges) == 0:
+            st.error("No hay objetos en el lienzo para exportar.")
+        else:
+            svg = export_svg_cached(canvas_key, nodes, edges)
+            st.image(svg, caption="Diagrama exportado (SVG)")
+            st.download_button("Descargar SVG", data=svg.encode("utf-8"), file_name="diagrama_feynman.svg", mime="image/svg+xml")
+
 st.markdown("---")
 st.markdown("💡 **Sugerencias de uso / mejoras**:")
 st.markdown("""